@@ -1,19 +1,106 @@
 import argparse
 import csv
+import heapq
+import http.client
+import io
 import json
+import multiprocessing
 import os
+import re
+import sqlite3
 import sys
+import tempfile
+import threading
 import time
-from dataclasses import dataclass, fields
+from collections import deque
+from contextlib import ExitStack, closing, nullcontext
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from datetime import datetime, timezone
 from email.message import Message
+from email.utils import parsedate_to_datetime
+from functools import partial
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
+from typing import (
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 GITHUB_API = "https://api.github.com"
 
+GRAPHQL_USER_ID_QUERY = """
+query($login: String!) {
+  user(login: $login) { id }
+}
+"""
+
+GRAPHQL_HISTORY_QUERY = """
+query(
+  $owner: String!, $name: String!, $authorId: ID!, $cursor: String,
+  $since: GitTimestamp, $until: GitTimestamp
+) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(
+            first: 100, after: $cursor, author: {id: $authorId},
+            since: $since, until: $until
+          ) {
+            pageInfo { endCursor hasNextPage }
+            nodes {
+              oid
+              url
+              message
+              author { user { login } name email date }
+              committer { user { login } name email date }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+SORT_RUN_ROWS = 10_000
+
+SEARCH_RESULT_LIMIT = 1000
+
+PAGE_PREFETCH_WINDOW = 8
+
+ZSTD_LEVEL = 3
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+_NEXT_LINK_RE = re.compile(r'<([^>]+)>\s*;\s*rel="next"')
+_LAST_LINK_RE = re.compile(r'<([^>]+)>\s*;\s*rel="last"')
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent / ".http_cache.sqlite3"
+
 TARGET_REPOS: List[Tuple[str, str]] = [
     ("GrandCharter", "grand-charter"),
     ("GrandCharter", "outlook-integration"),
@@ -22,82 +109,115 @@ TARGET_REPOS: List[Tuple[str, str]] = [
 ]
 
 
-@dataclass(frozen=True)
-class CommitRow:
-    org: str
-    repo: str
-    repo_full_name: str
-    sha: str
-    html_url: str
-    api_url: str
-    author_login: Optional[str]
-    committer_login: Optional[str]
-    commit_author_name: Optional[str]
-    commit_author_email: Optional[str]
-    commit_author_date: Optional[str]
-    commit_committer_name: Optional[str]
-    commit_committer_email: Optional[str]
-    commit_committer_date: Optional[str]
-    message: str
-
-    def as_dict(self) -> Dict[str, Optional[str]]:
-        return {
-            "org": self.org,
-            "repo": self.repo,
-            "repo_full_name": self.repo_full_name,
-            "sha": self.sha,
-            "html_url": self.html_url,
-            "api_url": self.api_url,
-            "author_login": self.author_login,
-            "committer_login": self.committer_login,
-            "commit_author_name": self.commit_author_name,
-            "commit_author_email": self.commit_author_email,
-            "commit_author_date": self.commit_author_date,
-            "commit_committer_name": self.commit_committer_name,
-            "commit_committer_email": self.commit_committer_email,
-            "commit_committer_date": self.commit_committer_date,
-            "message": self.message,
-        }
+CommitRow = Dict[str, Optional[str]]
 
+FIELDNAMES: Tuple[str, ...] = (
+    "org",
+    "repo",
+    "repo_full_name",
+    "sha",
+    "html_url",
+    "api_url",
+    "author_login",
+    "committer_login",
+    "commit_author_name",
+    "commit_author_email",
+    "commit_author_date",
+    "commit_committer_name",
+    "commit_committer_email",
+    "commit_committer_date",
+    "message",
+)
 
-def _load_env_file(path: Path) -> None:
-    try:
-        content = path.read_text(encoding="utf-8")
-    except OSError:
-        return
 
+if orjson is not None:
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj: object) -> bytes:
+        return orjson.dumps(obj)
+
+else:
+    _json_loads = json.loads
+
+    def _json_dumps(obj: object) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _iter_env_lines(content: str) -> Iterable[Tuple[str, str]]:
     for raw in content.splitlines():
         line = raw.strip()
-        if not line or line.startswith("#"):
+        if not line or line[0] == "#":
             continue
-        if "=" not in line:
-            continue
-        k, v = line.split("=", 1)
+        k, sep, v = line.partition("=")
         key = k.strip()
-        value = v.strip()
-        if not key:
+        if not sep or not key:
             continue
-        if (value.startswith('"') and value.endswith('"')) or (
-            value.startswith("'") and value.endswith("'")
-        ):
+        value = v.strip()
+        if value and value[0] == value[-1] and value[0] in "\"'":
             value = value[1:-1]
+        yield key, value
+
+
+def _load_env_file(path: Path) -> None:
+    try:
+        content = path.read_text(encoding="utf-8")
+    except OSError:
+        return
+
+    parsed: Dict[str, str] = {}
+    for key, value in _iter_env_lines(content):
         if key not in os.environ:
-            os.environ[key] = value
+            parsed.setdefault(key, value)
+    os.environ.update(parsed)
 
 
 def _parse_next_link(link_header: Optional[str]) -> Optional[str]:
-    if not link_header:
+    m = _NEXT_LINK_RE.search(link_header) if link_header else None
+    return m.group(1) if m else None
+
+
+def _parse_last_page(link_header: Optional[str]) -> Optional[Tuple[str, int]]:
+    m = _LAST_LINK_RE.search(link_header) if link_header else None
+    if not m:
         return None
-    parts = [p.strip() for p in link_header.split(",")]
-    for part in parts:
-        if 'rel="next"' in part:
-            left = part.split(";")[0].strip()
-            if left.startswith("<") and left.endswith(">"):
-                return left[1:-1]
-    return None
+    last_url = m.group(1)
+    pages = [v for k, v in parse_qsl(urlsplit(last_url).query) if k == "page"]
+    try:
+        return last_url, int(pages[-1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _page_url(url: str, page: int) -> str:
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != "page"]
+    query.append(("page", str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[int]:
+    # Retry-After is either delay-seconds or an HTTP-date (RFC 9110).
+    if not value:
+        return None
+    try:
+        return max(0, int(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0, int(when.timestamp() - time.time()))
 
 
 def _sleep_if_rate_limited(headers: Message) -> bool:
+    # Secondary rate limits send Retry-After and no reset time.
+    retry_after = _retry_after_seconds(headers.get("Retry-After"))
+    if retry_after is not None:
+        time.sleep(retry_after + 1)
+        return True
     remaining = headers.get("X-RateLimit-Remaining")
     reset = headers.get("X-RateLimit-Reset")
     if remaining == "0" and reset:
@@ -112,76 +232,288 @@ def _sleep_if_rate_limited(headers: Message) -> bool:
     return False
 
 
-def _make_request(url: str, token: Optional[str], user_agent: str) -> Request:
+_CONNECTIONS = threading.local()
+_OPEN_CONNECTIONS: List[http.client.HTTPConnection] = []
+_OPEN_CONNECTIONS_LOCK = threading.Lock()
+
+# Caps requests in flight across all threads; set by _collect_all_repos.
+_REQUEST_SLOTS: Optional[threading.BoundedSemaphore] = None
+
+# Raised when a reused keep-alive socket was already closed by the server.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+def _get_connection(
+    scheme: str, netloc: str, timeout_s: int
+) -> http.client.HTTPConnection:
+    pool: Optional[Dict[Tuple[str, str], http.client.HTTPConnection]] = getattr(
+        _CONNECTIONS, "pool", None
+    )
+    if pool is None:
+        pool = {}
+        _CONNECTIONS.pool = pool
+    conn = pool.get((scheme, netloc))
+    if conn is None:
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(netloc, timeout=timeout_s)
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=timeout_s)
+        pool[(scheme, netloc)] = conn
+        with _OPEN_CONNECTIONS_LOCK:
+            _OPEN_CONNECTIONS.append(conn)
+    return conn
+
+
+def _drop_connection(scheme: str, netloc: str) -> None:
+    pool = getattr(_CONNECTIONS, "pool", None)
+    if not pool:
+        return
+    conn = pool.pop((scheme, netloc), None)
+    if conn is not None:
+        conn.close()
+        with _OPEN_CONNECTIONS_LOCK:
+            if conn in _OPEN_CONNECTIONS:
+                _OPEN_CONNECTIONS.remove(conn)
+
+
+def _close_connections() -> None:
+    with _OPEN_CONNECTIONS_LOCK:
+        while _OPEN_CONNECTIONS:
+            _OPEN_CONNECTIONS.pop().close()
+
+
+_CACHE_CONNECTIONS = threading.local()
+_CACHE_OPEN: List[sqlite3.Connection] = []
+_CACHE_OPEN_LOCK = threading.Lock()
+
+
+def _cache_init(path: Path) -> bool:
+    try:
+        with closing(sqlite3.connect(str(path), timeout=30)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "url TEXT PRIMARY KEY, etag TEXT NOT NULL, link TEXT, "
+                "body BLOB NOT NULL)"
+            )
+    except sqlite3.Error:
+        return False
+    return True
+
+
+def _cache_connection(path: Path) -> sqlite3.Connection:
+    conns: Optional[Dict[Path, sqlite3.Connection]] = getattr(
+        _CACHE_CONNECTIONS, "conns", None
+    )
+    if conns is None:
+        conns = {}
+        _CACHE_CONNECTIONS.conns = conns
+    conn = conns.get(path)
+    if conn is None:
+        # Only the owning thread uses it; check_same_thread is off so
+        # _cache_close_all can close it once the workers are done.
+        conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        conns[path] = conn
+        with _CACHE_OPEN_LOCK:
+            _CACHE_OPEN.append(conn)
+    return conn
+
+
+def _cache_close_all() -> None:
+    with _CACHE_OPEN_LOCK:
+        while _CACHE_OPEN:
+            _CACHE_OPEN.pop().close()
+
+
+def _cache_get(path: Path, url: str) -> Optional[Tuple[str, Optional[str], bytes]]:
+    try:
+        row = (
+            _cache_connection(path)
+            .execute("SELECT etag, link, body FROM responses WHERE url = ?", (url,))
+            .fetchone()
+        )
+    except sqlite3.Error:
+        return None
+    if row is None:
+        return None
+    body = bytes(row[2])
+    if body.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            return None
+        try:
+            body = zstandard.ZstdDecompressor().decompress(body)
+        except zstandard.ZstdError:
+            return None
+    return row[0], row[1], body
+
+
+def _cache_put(
+    path: Path, url: str, etag: str, link: Optional[str], body: bytes
+) -> None:
+    if zstandard is not None:
+        body = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    try:
+        with _cache_connection(path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, link, body) "
+                "VALUES (?, ?, ?, ?)",
+                (url, etag, link, body),
+            )
+    except sqlite3.Error:
+        pass
+
+
+def _request_headers(token: Optional[str], user_agent: str) -> Dict[str, str]:
     headers = {"Accept": "application/vnd.github+json", "User-Agent": user_agent}
     if token:
         headers["Authorization"] = f"Bearer {token}"
-    return Request(url, headers=headers, method="GET")
+    return headers
 
 
-def _read_body_bytes(resp) -> bytes:
-    try:
-        return resp.read() or b""
-    except OSError:
-        return b""
+def _send_request(
+    conn: http.client.HTTPConnection,
+    method: str,
+    target: str,
+    body: Optional[bytes],
+    headers: Dict[str, str],
+) -> Tuple[http.client.HTTPResponse, bytes]:
+    conn.request(method, target, body=body, headers=headers)
+    resp = conn.getresponse()
+    return resp, resp.read()
 
 
-def _request_json(
+def _request_raw(
     url: str,
     token: Optional[str],
     user_agent: str,
     timeout_s: int,
     max_retries: int,
     retry_backoff_s: float,
-) -> Tuple[Message, object]:
+    cache_path: Optional[Path] = None,
+    method: str = "GET",
+    payload: Optional[object] = None,
+) -> Tuple[Message, bytes]:
+    if method != "GET":
+        cache_path = None
+    data_bytes = _json_dumps(payload) if payload is not None else None
     last_exc: Optional[Exception] = None
+    cached: Optional[Tuple[str, Optional[str], bytes]] = None
+    cached_url: Optional[str] = None
     for attempt in range(max_retries + 1):
-        req = _make_request(url=url, token=token, user_agent=user_agent)
+        parts = urlsplit(url)
+        target = f"{parts.path}?{parts.query}" if parts.query else parts.path
+        conn = _get_connection(parts.scheme, parts.netloc, timeout_s)
+        req_headers = _request_headers(token=token, user_agent=user_agent)
+        if cache_path and url != cached_url:
+            cached = _cache_get(cache_path, url)
+            cached_url = url
+        if cached:
+            req_headers["If-None-Match"] = cached[0]
+        if data_bytes is not None:
+            req_headers["Content-Type"] = "application/json"
         try:
-            with urlopen(req, timeout=timeout_s) as resp:
-                headers = resp.headers
-                body = _read_body_bytes(resp)
-                data = json.loads(body.decode("utf-8")) if body else None
-                return headers, data
-        except HTTPError as e:
-            headers = e.headers
-            if (
-                int(getattr(e, "code", 0)) == 403
-                and headers
-                and _sleep_if_rate_limited(headers)
-            ):
-                continue
-            if int(getattr(e, "code", 0)) in (500, 502, 503, 504):
-                last_exc = e
-                if attempt < max_retries:
-                    time.sleep(retry_backoff_s * (2**attempt))
-                    continue
-            body = _read_body_bytes(e)
-            payload: object
-            try:
-                payload = json.loads(body.decode("utf-8")) if body else {"message": ""}
-            except ValueError:
-                payload = {"message": body.decode("utf-8", errors="replace")}
-            raise RuntimeError(f"GitHub API error {e.code} for {url}: {payload}") from e
-        except URLError as e:
+            with _REQUEST_SLOTS or nullcontext():
+                reused = conn.sock is not None
+                try:
+                    resp, body = _send_request(
+                        conn, method, target, data_bytes, req_headers
+                    )
+                except _STALE_CONNECTION_ERRORS:
+                    if not reused:
+                        raise
+                    # The server closed the idle keep-alive socket; that says
+                    # nothing about the request, so resend it on a fresh
+                    # connection without spending a retry.
+                    _drop_connection(parts.scheme, parts.netloc)
+                    conn = _get_connection(parts.scheme, parts.netloc, timeout_s)
+                    resp, body = _send_request(
+                        conn, method, target, data_bytes, req_headers
+                    )
+        except (OSError, http.client.HTTPException) as e:
+            _drop_connection(parts.scheme, parts.netloc)
             last_exc = e
             if attempt < max_retries:
                 time.sleep(retry_backoff_s * (2**attempt))
                 continue
             raise
-        except TimeoutError as e:
-            last_exc = e
+
+        headers = resp.headers
+        status = resp.status
+        if status == 304 and cached:
+            # 304s carry no Link header; restore the cached one so pagination
+            # continues from the cache.
+            del headers["Link"]
+            if cached[1]:
+                headers["Link"] = cached[1]
+            return headers, cached[2]
+        if status < 300:
+            etag = headers.get("ETag")
+            if cache_path and etag and body:
+                _cache_put(cache_path, url, etag, headers.get("Link"), body)
+            return headers, body
+        if status in (301, 302, 307, 308) and headers.get("Location"):
+            url = urljoin(url, headers["Location"])
+            continue
+        if (
+            status in (403, 429)
+            and attempt < max_retries
+            and _sleep_if_rate_limited(headers)
+        ):
+            continue
+        if status in (500, 502, 503, 504):
+            last_exc = RuntimeError(f"GitHub API error {status} for {url}")
             if attempt < max_retries:
                 time.sleep(retry_backoff_s * (2**attempt))
                 continue
-            raise
+        error: object
+        try:
+            error = _json_loads(body) if body else {"message": ""}
+        except ValueError:
+            error = {"message": body.decode("utf-8", errors="replace")}
+        raise RuntimeError(f"GitHub API error {status} for {url}: {error}")
 
     if last_exc:
         raise last_exc
     raise RuntimeError("Unexpected request failure")
 
 
-def iter_commits_for_repo(
+def _request_json(
+    url: str,
+    token: Optional[str],
+    user_agent: str,
+    timeout_s: int,
+    max_retries: int,
+    retry_backoff_s: float,
+    cache_path: Optional[Path] = None,
+    method: str = "GET",
+    payload: Optional[object] = None,
+) -> Tuple[Message, object]:
+    headers, body = _request_raw(
+        url=url,
+        token=token,
+        user_agent=user_agent,
+        timeout_s=timeout_s,
+        max_retries=max_retries,
+        retry_backoff_s=retry_backoff_s,
+        cache_path=cache_path,
+        method=method,
+        payload=payload,
+    )
+    return headers, _json_loads(body) if body else None
+
+
+def _commit_items(data: object, repo_full_name: str) -> Iterable[Dict]:
+    if not isinstance(data, list):
+        raise RuntimeError(f"Unexpected response for commits: {repo_full_name}")
+    for item in data:
+        if isinstance(item, dict):
+            yield item
+
+
+def iter_commit_pages_for_repo(
     repo_full_name: str,
     author: str,
     since: Optional[str],
@@ -191,76 +523,339 @@ def iter_commits_for_repo(
     timeout_s: int,
     max_retries: int,
     retry_backoff_s: float,
-) -> Iterable[Dict]:
+    cache_path: Optional[Path] = None,
+    page_pool: Optional[Executor] = None,
+) -> Iterable[bytes]:
     params: Dict[str, str] = {"per_page": "100", "author": author}
     if since:
         params["since"] = since
     if until:
         params["until"] = until
     url = f"{GITHUB_API}/repos/{repo_full_name}/commits?{urlencode(params)}"
+    fetch = partial(
+        _request_raw,
+        token=token,
+        user_agent=user_agent,
+        timeout_s=timeout_s,
+        max_retries=max_retries,
+        retry_backoff_s=retry_backoff_s,
+        cache_path=cache_path,
+    )
+
+    headers, body = fetch(url=url)
+    yield body
+    link = headers.get("Link") if headers else None
+
+    # The first page's rel="last" gives the page count up front, so the
+    # remaining pages can be requested concurrently instead of one per RTT.
+    last = _parse_last_page(link) if page_pool is not None else None
+    if last:
+        last_url, last_page = last
+        urls = (_page_url(last_url, n) for n in range(2, last_page + 1))
+        pending = deque(
+            page_pool.submit(fetch, url=u) for u in islice(urls, PAGE_PREFETCH_WINDOW)
+        )
+        while pending:
+            _, body = pending.popleft().result()
+            next_url = next(urls, None)
+            if next_url is not None:
+                pending.append(page_pool.submit(fetch, url=next_url))
+            yield body
+        return
+
+    url = _parse_next_link(link)
     while url:
-        headers, data = _request_json(
-            url=url,
+        headers, body = fetch(url=url)
+        yield body
+        url = _parse_next_link(headers.get("Link") if headers else None)
+
+
+def iter_commits_for_repo(
+    repo_full_name: str,
+    author: str,
+    since: Optional[str],
+    until: Optional[str],
+    token: Optional[str],
+    user_agent: str,
+    timeout_s: int,
+    max_retries: int,
+    retry_backoff_s: float,
+    cache_path: Optional[Path] = None,
+    page_pool: Optional[Executor] = None,
+) -> Iterable[Dict]:
+    for body in iter_commit_pages_for_repo(
+        repo_full_name=repo_full_name,
+        author=author,
+        since=since,
+        until=until,
+        token=token,
+        user_agent=user_agent,
+        timeout_s=timeout_s,
+        max_retries=max_retries,
+        retry_backoff_s=retry_backoff_s,
+        cache_path=cache_path,
+        page_pool=page_pool,
+    ):
+        yield from _commit_items(_json_loads(body) if body else None, repo_full_name)
+
+
+def _normalize_search_item(item: Dict) -> Dict:
+    # Search reports git dates as "2019-04-01T09:40:39.000-07:00"; match the
+    # UTC form /commits returns so rows sort the same either way.
+    c = item.get("commit")
+    if isinstance(c, dict):
+        for key in ("author", "committer"):
+            obj = c.get(key)
+            if isinstance(obj, dict) and obj.get("date"):
+                obj["date"] = _to_utc_iso(obj["date"])
+    return item
+
+
+def iter_commits_via_search(
+    repo_full_name: str,
+    author: str,
+    since: Optional[str],
+    until: Optional[str],
+    token: Optional[str],
+    user_agent: str,
+    timeout_s: int,
+    max_retries: int,
+    retry_backoff_s: float,
+    cache_path: Optional[Path] = None,
+    page_pool: Optional[Executor] = None,
+) -> Iterable[Dict]:
+    q = f"repo:{repo_full_name} author:{author}"
+    if since and until:
+        q += f" committer-date:{since}..{until}"
+    elif since:
+        q += f" committer-date:>={since}"
+    elif until:
+        q += f" committer-date:<={until}"
+    url = f"{GITHUB_API}/search/commits?{urlencode({'q': q, 'per_page': '100'})}"
+    fetch = partial(
+        _request_json,
+        token=token,
+        user_agent=user_agent,
+        timeout_s=timeout_s,
+        max_retries=max_retries,
+        retry_backoff_s=retry_backoff_s,
+        cache_path=cache_path,
+    )
+
+    # Search only serves the first 1000 matches and rejects some queries with
+    # 422; in those cases walk /commits instead.
+    try:
+        headers, data = fetch(url=url)
+    except RuntimeError as e:
+        msg = str(e)
+        if "GitHub API error 422" not in msg and "GitHub API error 403" not in msg:
+            raise
+        data = None
+    if (
+        not isinstance(data, dict)
+        or data.get("incomplete_results")
+        or int(data.get("total_count") or 0) > SEARCH_RESULT_LIMIT
+    ):
+        yield from iter_commits_for_repo(
+            repo_full_name=repo_full_name,
+            author=author,
+            since=since,
+            until=until,
             token=token,
             user_agent=user_agent,
             timeout_s=timeout_s,
             max_retries=max_retries,
             retry_backoff_s=retry_backoff_s,
+            cache_path=cache_path,
+            page_pool=page_pool,
         )
-        if not isinstance(data, list):
-            raise RuntimeError(f"Unexpected response for commits: {repo_full_name}")
-        for item in data:
+        return
+
+    while True:
+        items = data.get("items") if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            raise RuntimeError(f"Unexpected search response for {repo_full_name}")
+        for item in items:
             if isinstance(item, dict):
-                yield item
+                yield _normalize_search_item(item)
         url = _parse_next_link(headers.get("Link") if headers else None)
+        if not url:
+            return
+        headers, data = fetch(url=url)
 
 
-def commit_to_row(org: str, repo: Dict, commit: Dict) -> CommitRow:
+def _graphql(
+    query: str,
+    variables: Dict[str, object],
+    token: Optional[str],
+    user_agent: str,
+    timeout_s: int,
+    max_retries: int,
+    retry_backoff_s: float,
+) -> Dict:
+    url = f"{GITHUB_API}/graphql"
+    _, data = _request_json(
+        url=url,
+        token=token,
+        user_agent=user_agent,
+        timeout_s=timeout_s,
+        max_retries=max_retries,
+        retry_backoff_s=retry_backoff_s,
+        method="POST",
+        payload={"query": query, "variables": variables},
+    )
+    if not isinstance(data, dict):
+        raise RuntimeError(f"Unexpected GraphQL response for {url}")
+    errors = data.get("errors")
+    if errors:
+        if all(isinstance(e, dict) and e.get("type") == "NOT_FOUND" for e in errors):
+            raise RuntimeError(f"GitHub API error 404 for {url}: {errors}")
+        raise RuntimeError(f"GitHub GraphQL error for {url}: {errors}")
+    return data.get("data") or {}
+
+
+def graphql_user_id(
+    login: str,
+    token: Optional[str],
+    user_agent: str,
+    timeout_s: int,
+    max_retries: int,
+    retry_backoff_s: float,
+) -> str:
+    data = _graphql(
+        query=GRAPHQL_USER_ID_QUERY,
+        variables={"login": login},
+        token=token,
+        user_agent=user_agent,
+        timeout_s=timeout_s,
+        max_retries=max_retries,
+        retry_backoff_s=retry_backoff_s,
+    )
+    user = data.get("user")
+    if not isinstance(user, dict) or not user.get("id"):
+        raise RuntimeError(f"GitHub user not found: {login}")
+    return str(user["id"])
+
+
+def iter_commits_via_graphql(
+    repo_full_name: str,
+    author_id: str,
+    since: Optional[str],
+    until: Optional[str],
+    token: Optional[str],
+    user_agent: str,
+    timeout_s: int,
+    max_retries: int,
+    retry_backoff_s: float,
+) -> Iterable[Dict]:
+    owner, name = repo_full_name.split("/", 1)
+    variables: Dict[str, object] = {
+        "owner": owner,
+        "name": name,
+        "authorId": author_id,
+        "since": since,
+        "until": until,
+        "cursor": None,
+    }
+    while True:
+        data = _graphql(
+            query=GRAPHQL_HISTORY_QUERY,
+            variables=variables,
+            token=token,
+            user_agent=user_agent,
+            timeout_s=timeout_s,
+            max_retries=max_retries,
+            retry_backoff_s=retry_backoff_s,
+        )
+        repository = data.get("repository")
+        if not isinstance(repository, dict):
+            raise RuntimeError(f"GitHub API error 404 for {repo_full_name}")
+        branch = repository.get("defaultBranchRef")
+        if not isinstance(branch, dict):
+            return
+        history = (branch.get("target") or {}).get("history")
+        if not isinstance(history, dict):
+            raise RuntimeError(f"Unexpected response for commits: {repo_full_name}")
+        for node in history.get("nodes") or []:
+            if isinstance(node, dict):
+                yield node
+        page_info = history.get("pageInfo") or {}
+        if not page_info.get("hasNextPage"):
+            return
+        variables["cursor"] = page_info.get("endCursor")
+
+
+def _to_utc_iso(ts: Optional[str]) -> Optional[str]:
+    # GraphQL reports git timestamps in the author's offset; REST reports UTC.
+    if not ts:
+        return ts
+    try:
+        dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except ValueError:
+        return ts
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def graphql_node_to_row(org: str, repo: Dict, node: Dict) -> CommitRow:
     repo_name = str(repo.get("name") or "")
     repo_full_name = str(repo.get("full_name") or f"{org}/{repo_name}")
 
-    sha = str(commit.get("sha") or "")
-    html_url = str(commit.get("html_url") or "")
-    api_url = str(commit.get("url") or "")
+    sha = str(node.get("oid") or "")
+    author_obj = node.get("author") or {}
+    committer_obj = node.get("committer") or {}
+    author_user = author_obj.get("user") or {}
+    committer_user = committer_obj.get("user") or {}
 
-    author_login = None
-    if isinstance(commit.get("author"), dict):
-        author_login = commit["author"].get("login")
+    return {
+        "org": org,
+        "repo": repo_name,
+        "repo_full_name": repo_full_name,
+        "sha": sha,
+        "html_url": str(node.get("url") or ""),
+        "api_url": f"{GITHUB_API}/repos/{repo_full_name}/commits/{sha}",
+        "author_login": author_user.get("login"),
+        "committer_login": committer_user.get("login"),
+        "commit_author_name": author_obj.get("name"),
+        "commit_author_email": author_obj.get("email"),
+        "commit_author_date": _to_utc_iso(author_obj.get("date")),
+        "commit_committer_name": committer_obj.get("name"),
+        "commit_committer_email": committer_obj.get("email"),
+        "commit_committer_date": _to_utc_iso(committer_obj.get("date")),
+        "message": str(node.get("message") or ""),
+    }
 
-    committer_login = None
-    if isinstance(commit.get("committer"), dict):
-        committer_login = commit["committer"].get("login")
 
+def commit_to_row(org: str, repo: Dict, commit: Dict) -> CommitRow:
+    repo_name = repo.get("name") or ""
+    repo_full_name = repo.get("full_name") or f"{org}/{repo_name}"
+
+    # "author"/"committer" are null when the commit email isn't linked to an
+    # account; the rest of the item is plain JSON strings.
+    author = commit.get("author")
+    committer = commit.get("committer")
     c = commit.get("commit") or {}
-    author_obj = (c.get("author") or {}) if isinstance(c, dict) else {}
-    committer_obj = (c.get("committer") or {}) if isinstance(c, dict) else {}
-    message = ""
-    if isinstance(c, dict) and c.get("message") is not None:
-        message = str(c.get("message"))
-
-    def _get(obj: Dict, key: str) -> Optional[str]:
-        v = obj.get(key)
-        if v is None:
-            return None
-        return str(v)
+    author_obj = c.get("author") or {}
+    committer_obj = c.get("committer") or {}
 
-    return CommitRow(
-        org=org,
-        repo=repo_name,
-        repo_full_name=repo_full_name,
-        sha=sha,
-        html_url=html_url,
-        api_url=api_url,
-        author_login=str(author_login) if author_login is not None else None,
-        committer_login=str(committer_login) if committer_login is not None else None,
-        commit_author_name=_get(author_obj, "name"),
-        commit_author_email=_get(author_obj, "email"),
-        commit_author_date=_get(author_obj, "date"),
-        commit_committer_name=_get(committer_obj, "name"),
-        commit_committer_email=_get(committer_obj, "email"),
-        commit_committer_date=_get(committer_obj, "date"),
-        message=message,
-    )
+    return {
+        "org": org,
+        "repo": repo_name,
+        "repo_full_name": repo_full_name,
+        "sha": commit.get("sha") or "",
+        "html_url": commit.get("html_url") or "",
+        "api_url": commit.get("url") or "",
+        "author_login": author.get("login") if isinstance(author, dict) else None,
+        "committer_login": (
+            committer.get("login") if isinstance(committer, dict) else None
+        ),
+        "commit_author_name": author_obj.get("name"),
+        "commit_author_email": author_obj.get("email"),
+        "commit_author_date": author_obj.get("date"),
+        "commit_committer_name": committer_obj.get("name"),
+        "commit_committer_email": committer_obj.get("email"),
+        "commit_committer_date": committer_obj.get("date"),
+        "message": c.get("message") or "",
+    }
 
 
 def read_orgs_from_file(path: str) -> List[str]:
@@ -276,27 +871,282 @@ def read_orgs_from_file(path: str) -> List[str]:
     return orgs
 
 
+def _open_binary_output(path: str) -> BinaryIO:
+    raw = open(path, "wb")
+    if not path.endswith(".zst"):
+        return raw
+    if zstandard is None:
+        raw.close()
+        raise RuntimeError(f"Writing {path} requires the zstandard package.")
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw)
+
+
+def _open_jsonl(stack: ExitStack, path: str) -> Callable[[bytes], object]:
+    return stack.enter_context(_open_binary_output(path)).write
+
+
+def _open_csv(stack: ExitStack, path: str) -> Callable[[Sequence], object]:
+    f = stack.enter_context(
+        io.TextIOWrapper(_open_binary_output(path), encoding="utf-8", newline="")
+    )
+    w = csv.writer(f)
+    w.writerow(FIELDNAMES)
+    return w.writerow
+
+
 def write_jsonl(rows: Iterable[CommitRow], path: str) -> int:
     n = 0
-    with open(path, "w", encoding="utf-8") as f:
+    dumps = _json_dumps
+    with ExitStack() as stack:
+        write = _open_jsonl(stack, path)
         for r in rows:
-            f.write(json.dumps(r.as_dict(), ensure_ascii=False) + "\n")
+            write(dumps(r) + b"\n")
             n += 1
     return n
 
 
-def write_csv(rows: Iterable[CommitRow], path: str) -> int:
+def write_all(
+    rows: Iterable[CommitRow], jsonl_path: Optional[str], csv_path: Optional[str]
+) -> int:
     n = 0
-    fieldnames = [f.name for f in fields(CommitRow)]
-    with open(path, "w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
+    dumps = _json_dumps
+    values = itemgetter(*FIELDNAMES)
+    with ExitStack() as stack:
+        write_json = _open_jsonl(stack, jsonl_path) if jsonl_path else None
+        writerow = _open_csv(stack, csv_path) if csv_path else None
         for r in rows:
-            w.writerow(r.as_dict())
+            if write_json is not None:
+                write_json(dumps(r) + b"\n")
+            if writerow is not None:
+                writerow(values(r))
             n += 1
     return n
 
 
+def _row_sort_key(r: CommitRow) -> str:
+    # Orders like (date, repo_full_name, sha): NUL sorts below any character
+    # in those fields, and one string compares much faster than a tuple.
+    return f'{r["commit_author_date"] or ""}\0{r["repo_full_name"]}\0{r["sha"]}'
+
+
+def _write_sorted_run(rows: List[CommitRow], run_dir: Path) -> Path:
+    rows.sort(key=_row_sort_key)
+    fd, name = tempfile.mkstemp(dir=run_dir, suffix=".jsonl")
+    os.close(fd)
+    write_jsonl(rows, name)
+    return Path(name)
+
+
+def _iter_run(path: Path) -> Iterable[CommitRow]:
+    with open(path, "rb") as f:
+        for line in f:
+            yield _json_loads(line)
+
+
+def iter_sorted_rows(runs: List[Path]) -> Iterable[CommitRow]:
+    return heapq.merge(*[_iter_run(p) for p in runs], key=_row_sort_key)
+
+
+def _parse_and_rowify(body: bytes, org: str, repo: Dict) -> List[CommitRow]:
+    data = _json_loads(body) if body else None
+    return [
+        commit_to_row(org=org, repo=repo, commit=commit)
+        for commit in _commit_items(data, repo["full_name"])
+    ]
+
+
+def _iter_rows_in_pool(
+    pages: Iterable[bytes],
+    parse: Callable[[bytes], List[CommitRow]],
+    pool: Executor,
+    window: int,
+) -> Iterable[CommitRow]:
+    # Pages keep being fetched in this thread while up to `window` earlier
+    # pages are parsed in the pool; rows still come out in page order.
+    pending: Deque[Future] = deque()
+    try:
+        for body in pages:
+            pending.append(pool.submit(parse, body))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+    except RuntimeError:
+        # Keep rows from pages fetched before the failure (e.g. a mid-walk 404).
+        while pending:
+            yield from pending.popleft().result()
+        raise
+    while pending:
+        yield from pending.popleft().result()
+
+
+def collect_repo(
+    org: str,
+    repo_name: str,
+    author: str,
+    since: Optional[str],
+    until: Optional[str],
+    token: Optional[str],
+    user_agent: str,
+    timeout_s: int,
+    max_retries: int,
+    retry_backoff_s: float,
+    run_dir: Path,
+    cache_path: Optional[Path] = None,
+    graphql_author_id: Optional[str] = None,
+    page_pool: Optional[Executor] = None,
+    search: bool = False,
+    parse_pool: Optional[Executor] = None,
+) -> List[Path]:
+    full_name = f"{org}/{repo_name}"
+    repo = {"name": repo_name, "full_name": full_name}
+    rows: Iterable[CommitRow]
+    if graphql_author_id:
+        rows = (
+            graphql_node_to_row(org=org, repo=repo, node=node)
+            for node in iter_commits_via_graphql(
+                repo_full_name=full_name,
+                author_id=graphql_author_id,
+                since=since,
+                until=until,
+                token=token,
+                user_agent=user_agent,
+                timeout_s=timeout_s,
+                max_retries=max_retries,
+                retry_backoff_s=retry_backoff_s,
+            )
+        )
+    elif parse_pool is not None and not search:
+        rows = _iter_rows_in_pool(
+            pages=iter_commit_pages_for_repo(
+                repo_full_name=full_name,
+                author=author,
+                since=since,
+                until=until,
+                token=token,
+                user_agent=user_agent,
+                timeout_s=timeout_s,
+                max_retries=max_retries,
+                retry_backoff_s=retry_backoff_s,
+                cache_path=cache_path,
+                page_pool=page_pool,
+            ),
+            parse=partial(_parse_and_rowify, org=org, repo=repo),
+            pool=parse_pool,
+            window=PAGE_PREFETCH_WINDOW,
+        )
+    else:
+        fetch_commits = iter_commits_via_search if search else iter_commits_for_repo
+        rows = (
+            commit_to_row(org=org, repo=repo, commit=commit)
+            for commit in fetch_commits(
+                repo_full_name=full_name,
+                author=author,
+                since=since,
+                until=until,
+                token=token,
+                user_agent=user_agent,
+                timeout_s=timeout_s,
+                max_retries=max_retries,
+                retry_backoff_s=retry_backoff_s,
+                cache_path=cache_path,
+                page_pool=page_pool,
+            )
+        )
+
+    runs: List[Path] = []
+    buffer: List[CommitRow] = []
+    try:
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= SORT_RUN_ROWS:
+                runs.append(_write_sorted_run(buffer, run_dir))
+                buffer = []
+    except RuntimeError as e:
+        msg = str(e)
+        if "GitHub API error 404" not in msg:
+            raise
+        print(f"Skipping {full_name}: {msg}", file=sys.stderr)
+    if buffer:
+        runs.append(_write_sorted_run(buffer, run_dir))
+    return runs
+
+
+def _collect_all_repos(
+    author: str,
+    since: Optional[str],
+    until: Optional[str],
+    token: Optional[str],
+    user_agent: str,
+    timeout_s: int,
+    max_retries: int,
+    retry_backoff_s: float,
+    concurrency: int,
+    run_dir: Path,
+    cache_path: Optional[Path] = None,
+    graphql: bool = False,
+    page_concurrency: int = 1,
+    search: bool = False,
+    parse_processes: int = 0,
+) -> List[List[Path]]:
+    global _REQUEST_SLOTS
+    _REQUEST_SLOTS = threading.BoundedSemaphore(max(1, concurrency))
+    try:
+        graphql_author_id = None
+        if graphql:
+            graphql_author_id = graphql_user_id(
+                login=author,
+                token=token,
+                user_agent=user_agent,
+                timeout_s=timeout_s,
+                max_retries=max_retries,
+                retry_backoff_s=retry_backoff_s,
+            )
+        workers = max(1, min(concurrency, len(TARGET_REPOS)))
+        with ExitStack() as stack:
+            parse_pool = None
+            if parse_processes > 0:
+                parse_pool = stack.enter_context(
+                    # Workers start lazily from repo threads mid-request;
+                    # forking a multi-threaded process can deadlock and
+                    # leaks its open sockets into the children.
+                    ProcessPoolExecutor(
+                        max_workers=parse_processes,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                )
+            page_pool = None
+            if page_concurrency > 1:
+                page_pool = stack.enter_context(
+                    ThreadPoolExecutor(max_workers=page_concurrency)
+                )
+            pool = stack.enter_context(ThreadPoolExecutor(max_workers=workers))
+            futures = [
+                pool.submit(
+                    collect_repo,
+                    org=org,
+                    repo_name=repo_name,
+                    author=author,
+                    since=since,
+                    until=until,
+                    token=token,
+                    user_agent=user_agent,
+                    timeout_s=timeout_s,
+                    max_retries=max_retries,
+                    retry_backoff_s=retry_backoff_s,
+                    run_dir=run_dir,
+                    cache_path=cache_path,
+                    graphql_author_id=graphql_author_id,
+                    page_pool=page_pool,
+                    search=search,
+                    parse_pool=parse_pool,
+                )
+                for org, repo_name in TARGET_REPOS
+            ]
+            return [f.result() for f in futures]
+    finally:
+        _REQUEST_SLOTS = None
+        _close_connections()
+
+
 def parse_args(argv: List[str]) -> argparse.Namespace:
     p = argparse.ArgumentParser(
         description="Retrieve every commit authored by a user across a fixed set of GitHub org/repo targets."
@@ -324,6 +1174,44 @@ def parse_args(argv: List[str]) -> argparse.Namespace:
         default=1.0,
         help="Backoff base seconds for retries.",
     )
+    p.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of repos fetched in parallel, and the cap on requests in flight to GitHub at once.",
+    )
+    p.add_argument(
+        "--page-concurrency",
+        type=int,
+        default=4,
+        help="Pages of one repo fetched in parallel once the page count is known.",
+    )
+    p.add_argument(
+        "--parse-processes",
+        type=int,
+        default=0,
+        help="Processes parsing /commits pages off the fetch threads (0 = inline).",
+    )
+    p.add_argument(
+        "--cache",
+        default=str(DEFAULT_CACHE_PATH),
+        help="SQLite file caching responses for conditional (ETag) requests.",
+    )
+    p.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the response cache.",
+    )
+    p.add_argument(
+        "--graphql",
+        action="store_true",
+        help="Fetch via GraphQL, requesting only the output fields (needs a token).",
+    )
+    p.add_argument(
+        "--search",
+        action="store_true",
+        help="Find commits via the Search API (falls back to /commits past 1000 hits).",
+    )
     p.add_argument(
         "--user-agent",
         default="uwaterloo-tools/github-org-commits",
@@ -341,14 +1229,22 @@ def main(argv: List[str]) -> int:
     _load_env_file(Path(__file__).resolve().parent / ".env")
 
     token = args.token or os.environ.get("GITHUB_TOKEN")
+    if zstandard is None and any(
+        p and p.endswith(".zst") for p in (args.jsonl, args.csv)
+    ):
+        raise SystemExit("Writing .zst output requires the zstandard package.")
+    if args.graphql and args.search:
+        raise SystemExit("Use at most one of --graphql and --search.")
+    if args.graphql and not token:
+        raise SystemExit("--graphql requires a token (--token or GITHUB_TOKEN).")
+
+    cache_path = None if args.no_cache else Path(args.cache)
+    if cache_path and not _cache_init(cache_path):
+        cache_path = None
 
-    rows: List[CommitRow] = []
-    for org, repo_name in TARGET_REPOS:
-        full_name = f"{org}/{repo_name}"
-        repo = {"name": repo_name, "full_name": full_name}
+    with tempfile.TemporaryDirectory(prefix="org-commits-") as run_dir:
         try:
-            for commit in iter_commits_for_repo(
-                repo_full_name=full_name,
+            repo_runs = _collect_all_repos(
                 author=str(args.user),
                 since=args.since,
                 until=args.until,
@@ -357,21 +1253,19 @@ def main(argv: List[str]) -> int:
                 timeout_s=int(args.timeout),
                 max_retries=int(args.max_retries),
                 retry_backoff_s=float(args.retry_backoff),
-            ):
-                rows.append(commit_to_row(org=org, repo=repo, commit=commit))
-        except RuntimeError as e:
-            msg = str(e)
-            if "GitHub API error 404" in msg:
-                print(f"Skipping {full_name}: {msg}", file=sys.stderr)
-                continue
-            raise
-
-    rows.sort(key=lambda r: (r.commit_author_date or "", r.repo_full_name, r.sha))
+                concurrency=int(args.concurrency),
+                run_dir=Path(run_dir),
+                cache_path=cache_path,
+                graphql=bool(args.graphql),
+                page_concurrency=int(args.page_concurrency),
+                search=bool(args.search),
+                parse_processes=int(args.parse_processes),
+            )
+        finally:
+            _cache_close_all()
+        runs = [p for chunk in repo_runs for p in chunk]
 
-    if args.jsonl:
-        write_jsonl(rows, args.jsonl)
-    if args.csv:
-        write_csv(rows, args.csv)
+        write_all(iter_sorted_rows(runs), jsonl_path=args.jsonl, csv_path=args.csv)
 
     return 0
 